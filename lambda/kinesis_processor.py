@@ -6,13 +6,18 @@ This module contains the Lambda function for processing streaming data
 from Kinesis and storing it in S3 with proper partitioning and error handling.
 """
 
-import json
+import asyncio
+import base64
+import contextlib
 import boto3
+import botocore.config
+import orjson
 import os
 import time
 import uuid
+import zstandard as zstd
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 import logging
 
@@ -20,13 +25,68 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize AWS clients
-kinesis_client = boto3.client('kinesis')
-s3_client = boto3.client('s3')
-cloudwatch_client = boto3.client('cloudwatch')
+# Initialize AWS clients (records arrive via the event source, so no Kinesis client).
+# Worst case per call is 2 x (1 s connect + 3 s read) plus one backoff of at most
+# 1 s, which keeps the INIT prewarm below Lambda's 10 s INIT limit; failed batches
+# are retried by the event source mapping rather than by the client
+client_settings = {
+    'max_pool_connections': 64,
+    'retries': {'mode': 'adaptive', 'max_attempts': 2},
+    'tcp_keepalive': True,
+    'connect_timeout': 1,
+    'read_timeout': 3
+}
+# Skip SigV4 payload hashing; uploads are already protected by HTTPS
+s3_settings = {
+    **client_settings,
+    'signature_version': 's3v4',
+    's3': {'payload_signing_enabled': False}
+}
+client_config = botocore.config.Config(**client_settings)
+s3_config = botocore.config.Config(**s3_settings)
+s3_client = boto3.client('s3', config=s3_config)
+cloudwatch_client = boto3.client('cloudwatch', config=client_config)
 
+# Open the S3 connection during INIT so the first batch upload skips DNS/TLS setup.
+# Record mode uploads through its own aiobotocore client, which this does not warm
+try:
+    s3_client.head_bucket(Bucket=os.environ['DATA_BUCKET_NAME'])
+except Exception:
+    pass
 
-@dataclass
+# Per-record output mode issues its PUTs concurrently on one event loop. The
+# loop and its aiobotocore client are created on first use, so batch mode never
+# loads aiobotocore, and are reused across warm invocations
+event_loop = None
+aio_exit_stack = contextlib.AsyncExitStack()
+aio_s3_client = None
+
+# Batched JSONL objects are zstd compressed before upload
+compressor = zstd.ZstdCompressor(level=3, threads=-1)
+
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Create the shared event loop on first use"""
+    global event_loop
+    if event_loop is None:
+        event_loop = asyncio.new_event_loop()
+    return event_loop
+
+
+async def _get_aio_s3_client():
+    """Open the shared aiobotocore S3 client on first use"""
+    global aio_s3_client
+    if aio_s3_client is None:
+        from aiobotocore.config import AioConfig
+        from aiobotocore.session import get_session
+        
+        aio_s3_client = await aio_exit_stack.enter_async_context(
+            get_session().create_client('s3', config=AioConfig(**s3_settings))
+        )
+    return aio_s3_client
+
+
+@dataclass(slots=True)
 class ProcessingResult:
     """Result of processing a single record"""
     record_id: str
@@ -54,6 +114,14 @@ class StreamProcessor:
         self.records_processed = 0
         self.records_failed = 0
         self.start_time = time.time()
+        self._begin_batch()
+    
+    def _begin_batch(self) -> None:
+        """Capture the batch arrival time and the partition path it maps to"""
+        self.batch_timestamp = datetime.utcnow()
+        self.partition_path = self._get_partition_path(self.batch_timestamp)
+        self.batch_ts_compact = self.batch_timestamp.strftime('%Y%m%d_%H%M%S')
+        self.batch_iso = self.batch_timestamp.isoformat()
     
     def _get_partition_path(self, timestamp: Optional[datetime] = None) -> str:
         """
@@ -72,14 +140,20 @@ class StreamProcessor:
         
         return (
             f"{self.prefix}"
-            f"year={timestamp.strftime('%Y')}/"
-            f"month={timestamp.strftime('%m')}/"
-            f"day={timestamp.strftime('%d')}/"
-            f"hour={timestamp.strftime('%H')}/"
+            f"year={timestamp.year:04d}/"
+            f"month={timestamp.month:02d}/"
+            f"day={timestamp.day:02d}/"
+            f"hour={timestamp.hour:02d}/"
         )
     
-    def _publish_metrics(self, metric_name: str, value: float, unit: str = "Count"):
-        """Publish custom metrics to CloudWatch"""
+    def _publish_metrics_batch(self, metrics: List[Tuple[str, float, str]]):
+        """
+        Publish custom metrics to CloudWatch in a single call.
+        
+        Args:
+            metrics: (metric_name, value, unit) tuples, at most 20
+        """
+        timestamp = datetime.utcnow()
         try:
             cloudwatch_client.put_metric_data(
                 Namespace='StreamingPipeline',
@@ -88,19 +162,20 @@ class StreamProcessor:
                         'MetricName': metric_name,
                         'Value': value,
                         'Unit': unit,
-                        'Timestamp': datetime.utcnow()
-                    },
+                        'Timestamp': timestamp
+                    }
+                    for metric_name, value, unit in metrics
                 ]
             )
         except Exception as e:
-            logger.warning(f"Failed to publish metric: {e}")
+            logger.warning(f"Failed to publish metrics: {e}")
     
     def _serialize_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
         """
         Serialize a record for storage.
         
         - Converts any non-serializable types
-        - Adds metadata
+        - Adds metadata, stamped with the batch arrival time
         
         Args:
             record: Raw record from Kinesis
@@ -111,79 +186,179 @@ class StreamProcessor:
         serialized = {
             "data": record,
             "metadata": {
-                "ingestion_timestamp": datetime.utcnow().isoformat(),
+                "ingestion_timestamp": self.batch_iso,
                 "pipeline_version": "1.0.0"
             }
         }
         return serialized
     
-    def process_record(self, record: Dict[str, Any]) -> ProcessingResult:
+    async def process_record(self, record: Dict[str, Any], client: Any) -> ProcessingResult:
         """
-        Process a single Kinesis record.
+        Process a single Kinesis record into its own S3 object.
         
         Args:
-            record: Kinesis record containing Data field
+            record: Kinesis event record with a base64 encoded kinesis.data field
+            client: aiobotocore S3 client used for the upload
             
         Returns:
             ProcessingResult with success/failure status
+            
+        Raises:
+            Exception: If the upload fails
         """
         start_time = time.time()
-        record_id = record.get('sequenceNumber', str(uuid.uuid4()))
-        partition_key = record.get('partitionKey', 'unknown')
+        kinesis_data = record['kinesis']
+        record_id = kinesis_data['sequenceNumber']
+        partition_key = kinesis_data.get('partitionKey', 'unknown')
         
         try:
             # Decode Kinesis data (base64 encoded)
-            import base64
-            data_str = base64.b64decode(record['data']).decode('utf-8')
-            data = json.loads(data_str)
+            data = orjson.loads(base64.b64decode(kinesis_data['data']))
             
             # Add processing metadata
             processed_data = self._serialize_record(data)
+        except Exception as e:
+            self.records_failed += 1
+            logger.error(f"Failed to process record {record_id}: {e}")
             
-            # Generate output path
-            timestamp = datetime.utcnow()
-            output_path = (
-                f"s3://{self.bucket_name}/"
-                f"{self._get_partition_path(timestamp)}"
-                f"data_{timestamp.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.json"
+            return ProcessingResult(
+                record_id=record_id,
+                success=False,
+                partition_key=partition_key,
+                error_message=str(e),
+                processing_time_ms=(time.time() - start_time) * 1000
             )
-            
-            # Upload to S3
-            s3_client.put_object(
+        
+        # Generate object key
+        key = f"{self.partition_path}data_{self.batch_ts_compact}_{record_id[-8:]}.json"
+        
+        # Upload to S3
+        try:
+            await client.put_object(
                 Bucket=self.bucket_name,
-                Key=output_path.replace(f"s3://{self.bucket_name}/", ''),
-                Body=json.dumps(processed_data, indent=2),
+                Key=key,
+                Body=orjson.dumps(processed_data, option=orjson.OPT_NAIVE_UTC),
                 ContentType='application/json',
                 Metadata={
                     'partition_key': partition_key,
                     'sequence_number': record_id
                 }
             )
+        except Exception as e:
+            logger.error(f"Failed to upload record {record_id}: {e}")
+            raise
+        
+        self.records_processed += 1
+        
+        return ProcessingResult(
+            record_id=record_id,
+            success=True,
+            partition_key=partition_key,
+            output_path=f"s3://{self.bucket_name}/{key}",
+            processing_time_ms=(time.time() - start_time) * 1000
+        )
+    
+    def process_records(self, records: List[Dict[str, Any]]) -> List[ProcessingResult]:
+        """
+        Process records into one S3 object each, uploading them concurrently.
+        
+        Args:
+            records: Kinesis event records with base64 encoded kinesis.data fields
             
-            processing_time = (time.time() - start_time) * 1000
+        Returns:
+            ProcessingResult for each record, in input order
             
-            logger.info(f"Successfully processed record {record_id}")
-            self.records_processed += 1
+        Raises:
+            Exception: If any upload fails, so the event source mapping
+                retries the whole batch
+        """
+        return _get_event_loop().run_until_complete(self._process_records(records))
+    
+    async def _process_records(self, records: List[Dict[str, Any]]) -> List[ProcessingResult]:
+        client = await _get_aio_s3_client()
+        # Let every upload settle before raising, so none is left pending on the loop
+        results = await asyncio.gather(
+            *(self.process_record(record, client) for record in records),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+    
+    def process_batch(self, records: List[Dict[str, Any]]) -> List[ProcessingResult]:
+        """
+        Process a batch of Kinesis records into a single JSONL object.
+        
+        All records share one partition path derived from the batch arrival
+        time, and the whole batch is zstd compressed and written with a
+        single S3 upload.
+        
+        Args:
+            records: Kinesis event records with base64 encoded kinesis.data fields
             
-            return ProcessingResult(
-                record_id=record_id,
-                success=True,
-                partition_key=partition_key,
-                output_path=output_path,
-                processing_time_ms=processing_time
-            )
+        Returns:
+            ProcessingResult for each record, in input order
             
-        except Exception as e:
-            self.records_failed += 1
-            logger.error(f"Failed to process record {record_id}: {e}")
+        Raises:
+            Exception: If the batch upload fails, so the event source
+                mapping retries the whole batch
+        """
+        self._begin_batch()
+        key = f"{self.partition_path}batch_{uuid.uuid4().hex}.jsonl.zst"
+        serialized = []
+        results = []
+        
+        for record in records:
+            start_time = time.time()
+            kinesis_data = record['kinesis']
+            record_id = kinesis_data['sequenceNumber']
+            partition_key = kinesis_data.get('partitionKey', 'unknown')
             
-            return ProcessingResult(
-                record_id=record_id,
-                success=False,
-                partition_key=partition_key,
-                error_message=str(e),
-                processing_time_ms=(time.time() - start_time) * 1000
-            )
+            try:
+                data = orjson.loads(base64.b64decode(kinesis_data['data']))
+                serialized.append(self._serialize_record(data))
+                results.append(ProcessingResult(
+                    record_id=record_id,
+                    success=True,
+                    partition_key=partition_key,
+                    processing_time_ms=(time.time() - start_time) * 1000
+                ))
+            except Exception as e:
+                logger.error(f"Failed to process record {record_id}: {e}")
+                results.append(ProcessingResult(
+                    record_id=record_id,
+                    success=False,
+                    partition_key=partition_key,
+                    error_message=str(e),
+                    processing_time_ms=(time.time() - start_time) * 1000
+                ))
+        
+        succeeded = [result for result in results if result.success]
+        if succeeded:
+            try:
+                body = compressor.compress(b"".join(
+                    [orjson.dumps(item, option=orjson.OPT_NAIVE_UTC | orjson.OPT_APPEND_NEWLINE) for item in serialized]
+                ))
+                s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    Body=body,
+                    ContentType='application/json',
+                    ContentEncoding='zstd',
+                    Metadata={'record_count': str(len(succeeded))}
+                )
+                output_path = f"s3://{self.bucket_name}/{key}"
+                for result in succeeded:
+                    result.output_path = output_path
+            except Exception as e:
+                logger.error(f"Failed to upload batch {key}: {e}")
+                raise
+        
+        self.records_processed += sum(1 for result in results if result.success)
+        self.records_failed += sum(1 for result in results if not result.success)
+        
+        return results
     
     def get_summary(self) -> Dict[str, Any]:
         """Get processing summary statistics"""
@@ -219,26 +394,39 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     if not bucket_name:
         raise ValueError("DATA_BUCKET_NAME environment variable not set")
     
+    output_mode = os.environ.get('OUTPUT_MODE', 'batch')
+    if output_mode not in ('batch', 'record'):
+        raise ValueError(f"OUTPUT_MODE must be 'batch' or 'record', got {output_mode!r}")
+    
     # Initialize processor
     processor = StreamProcessor(bucket_name=bucket_name, prefix="raw/")
     
-    # Process records
-    results = []
-    for record in event.get('Records', []):
-        result = processor.process_record(record)
-        results.append({
+    records = event.get('Records', [])
+    if output_mode == 'record':
+        # One object per record, uploaded concurrently
+        processing_results = processor.process_records(records)
+    else:
+        # Single batched object per invocation
+        processing_results = processor.process_batch(records)
+    
+    results = [
+        {
             'sequenceNumber': result.record_id,
             'success': result.success,
             'error': result.error_message
-        })
+        }
+        for result in processing_results
+    ]
     
     # Get summary
     summary = processor.get_summary()
     
     # Publish aggregate metrics
-    processor._publish_metrics('RecordsProcessed', summary['records_processed'])
-    processor._publish_metrics('RecordsFailed', summary['records_failed'])
-    processor._publish_metrics('ProcessingTimeMs', summary['elapsed_time_seconds'] * 1000)
+    processor._publish_metrics_batch([
+        ('RecordsProcessed', summary['records_processed'], 'Count'),
+        ('RecordsFailed', summary['records_failed'], 'Count'),
+        ('ProcessingTimeMs', summary['elapsed_time_seconds'] * 1000, 'Milliseconds'),
+    ])
     
     logger.info(f"Processing complete: {summary}")
     
@@ -258,9 +446,12 @@ if __name__ == "__main__":
     test_event = {
         'Records': [
             {
-                'sequenceNumber': 'test123',
-                'partitionKey': 'test-key',
-                'data': 'eyJ0ZXN0IjoiZGF0YSJ9'  # {"test":"data"} base64 encoded
+                'eventSource': 'aws:kinesis',
+                'kinesis': {
+                    'sequenceNumber': 'test123',
+                    'partitionKey': 'test-key',
+                    'data': 'eyJ0ZXN0IjoiZGF0YSJ9'  # {"test":"data"} base64 encoded
+                }
             }
         ]
     }
@@ -269,4 +460,4 @@ if __name__ == "__main__":
     os.environ['DATA_BUCKET_NAME'] = 'test-bucket'
     
     result = lambda_handler(test_event, None)
-    print(json.dumps(result, indent=2))
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode('utf-8'))